@@ -3,25 +3,51 @@ import os
 import sys
 import shutil
 import hashlib
+import heapq
+import bisect
+import bz2
+import struct
+import zlib
+import mmap
 import re
+import stat
 import json
 import yaml
 import requests
 import argparse
 import subprocess
 import plistlib
+import platform
 import tempfile
+import threading
 import time
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape as xml_unescape
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
-from github import Github, Auth
+from github import Github, Auth, UnknownObjectException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from semantic_version import Version
 
+# libyaml-backed loader/dumper when PyYAML was built with it (the PyPI wheels are)
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
+
 # --- Configuration & Constants ---
 WORKSPACE_ROOT = Path(__file__).resolve().parent.parent
 UPLOAD_DIR = WORKSPACE_ROOT / "upload"
 UPLOADED_DIR = WORKSPACE_ROOT / "uploaded"
 CASKS_DIR = WORKSPACE_ROOT / "Casks"
+APPS_MD_CACHE = WORKSPACE_ROOT / ".apps_md_cache.json"
+URL_SHA_CACHE = WORKSPACE_ROOT / ".url_sha_cache.json"
+SHA_CACHE = WORKSPACE_ROOT / ".sha_cache.json"
 STATE_FILE = WORKSPACE_ROOT / "state.json"
 APPS_YAML = WORKSPACE_ROOT / "apps.yaml"
 ENV_FILE = WORKSPACE_ROOT / ".env"
@@ -29,161 +55,710 @@ ENV_FILE = WORKSPACE_ROOT / ".env"
 # Regex for AppName-Version.ext (e.g. MyTool-1.0.2.dmg or Folx-5.32.dmg)
 FILENAME_PATTERN = re.compile(r"^(?P<name>[a-zA-Z0-9]+)-(?P<version>[\d\.]+)\.(?P<ext>dmg|pkg|zip)$")
 
+# Read size for hashing large DMG/PKG assets (1 MiB)
+HASH_CHUNK_SIZE = 1 << 20
+
+# Concurrent hash jobs; hashlib releases the GIL, so scale with cores
+HASH_WORKERS = os.cpu_count() or 4
+
+# Release asset uploads: attempts per asset (exponential backoff between them)
+UPLOAD_ATTEMPTS = 3
+# Concurrent asset uploads; GitHub accepts parallel uploads to one release
+UPLOAD_WORKERS = 4
+
+# Releases kept in state.json's history; older entries remain in git history
+STATE_HISTORY_LIMIT = 50
+
+# Concurrent signature checks (each mounts a DMG and runs spctl)
+VERIFY_WORKERS = 4
+
+# Concurrent repacks: overlaps one file's DMG compression with the next one's
+# extraction; hdiutil serializes beyond this anyway
+REPACK_WORKERS = 2
+
+# Concurrent apps.yaml update checks; each is a handful of GitHub API round-trips
+APP_PROBE_WORKERS = 8
+# Concurrent checksum-file downloads per release
+CHECKSUM_PROBE_WORKERS = 4
+
+# Copy buffer for extracting ZIP members; capped per member at its size so small files
+# don't allocate a full buffer
+COPY_BUFSIZE = 1 << 20
+
+# Upper bound on DMGs attached at once across all worker threads; macOS caps the number
+# of attached disk images, and each concurrent attach competes for the same diskimages helper
+MAX_MOUNTS = 8
+_MOUNT_SLOTS = threading.BoundedSemaphore(MAX_MOUNTS)
+# Seconds to wait for a free slot before giving up on an attach instead of hanging
+MOUNT_SLOT_TIMEOUT = 300
+
+# is_app_verified results for DMGs whose app was already assessed during repacking,
+# keyed by (path, size, mtime_ns), so Phase C doesn't attach them a second time
+_VERIFY_CACHE = {}
+
+# find_hash_in_release results keyed by (release id, asset name), so versions that resolve
+# to the same release don't download its checksum files again
+_RELEASE_HASH_CACHE = {}
+
+# Decompress ZIP members on several threads (zlib releases the GIL) once an
+# archive has at least this many files
+ZIP_PARALLEL_MIN_FILES = 32
+
+# Precompiled patterns for pkg metadata, kebab-casing names and rewriting cask fields
+_PKG_VERSION_RE = re.compile(r'version="([^"]+)"')
+_PKG_ID_RE = re.compile(r'(?:id|pkgid)="([^"]+)"')
+# Word boundaries: before a capital that follows a lowercase letter/digit, or that starts a
+# Capitalized word (one pass equivalent of (.)([A-Z][a-z]+) followed by ([a-z0-9])([A-Z]))
+_CAMEL_BOUNDARY_RE = re.compile(r'(?<=[a-z0-9])(?=[A-Z])|(?<=.)(?=[A-Z][a-z])')
+# Anchored to line starts so e.g. `homepage_url "..."` or trailing text never matches
+_CASK_FIELDS = re.compile(r'^(\s*)(version|sha256|url|app)\s+"[^"]*"', re.M)
+
+# Cask name/version/desc as read by update_apps_md, and the closing `end` that
+# postflight stanzas are inserted before
+_CASK_NAME_RE = re.compile(r'name "([^"]+)"')
+_CASK_VERSION_RE = re.compile(r'version "([^"]+)"')
+_CASK_DESC_RE = re.compile(r'desc "([^"]+)"')
+_CASK_END_RE = re.compile(r'(\n\s*end)')
+
+# Release assets: a bare SHA256 hex digest, checksum-file names (keyword anywhere, checked
+# by lookahead so "App.dmg.sha256" counts, plus a checksum extension), and installer names
+HEX64_RE = re.compile(r'[a-fA-F0-9]{64}')
+CHECKSUM_ASSET_RE = re.compile(r'^(?=.*(?:checksum|sha256|shasum)).*\.(?:txt|sha256|sha256sum|sum)$', re.I)
+ASSET_EXT_RE = re.compile(r'\.(?:dmg|pkg|zip)$', re.I)
+
+# Repacking: x.y.z version embedded in a file name, and characters dropped from app names
+_VER_IN_NAME_RE = re.compile(r'-(\d+\.\d+\.\d+)')
+_NON_ALNUM_RE = re.compile(r'[^a-zA-Z0-9]')
+
+# KEY=value lines in .env
+_ENV_LINE_RE = re.compile(r'^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*?)\s*$')
+# A quoted .env value, optionally followed by an inline comment
+_ENV_QUOTED_RE = re.compile(r'^([\'"])(.*?)\1\s*(?:#.*)?$')
+
+# The [remote "origin"] section of .git/config (up to the next section header), its
+# `url =` line (anchored, so `pushurl =` doesn't match), and user/repo within the URL
+_GIT_ORIGIN_SECTION_RE = re.compile(r'^\s*\[remote "origin"\][^\n]*\n(.*?)(?=^\s*\[|\Z)', re.M | re.S)
+_GIT_URL_LINE_RE = re.compile(r'^\s*url\s*=\s*(\S+)', re.M)
+_GITHUB_REMOTE_RE = re.compile(r"github\.com[:/](.+?)/(.+?)(\.git)?$")
+
+# apps.yaml text edits: the next top-level line (end of an app's block), and a block-style
+# `versions:` list up to its first item (group 2 is the item indentation)
+_YAML_TOP_LEVEL_RE = re.compile(r'^\S', re.M)
+_YAML_VERSIONS_RE = re.compile(r'^[ \t]+versions:[ \t]*\n(?:[ \t]*#.*\n)*([ \t]*)- ', re.M)
+
+# Artifact search: directory names never worth entering (dot-dirs such as .fseventsd and
+# .Trashes are skipped separately), and bundle suffixes whose contents are never searched
+_SCAN_SKIP_NAMES = frozenset({"__MACOSX"})
+_BUNDLE_SUFFIXES = frozenset({".app", ".pkg", ".framework", ".bundle", ".plugin", ".kext"})
+
+# xar (flat .pkg) header: magic, header size, version, TOC compressed/uncompressed length, checksum alg
+_XAR_HEADER = struct.Struct(">4sHHQQI")
+
+# Bundle name/version <key>/<string> pairs in an XML Info.plist
+_PLIST_BUNDLE_KEYS_RE = re.compile(
+    r'<key>(CFBundleName|CFBundleDisplayName|CFBundleShortVersionString|CFBundleVersion)</key>'
+    r'\s*<string>([^<]*)</string>')
+_XML_QUOTE_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+def run_silent(cmd, check=True):
+    """
+    Run a tool with stdout/stderr discarded. close_fds=False lets CPython use posix_spawn
+    (fds are non-inheritable by default, so nothing leaks into the child).
+    """
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                          check=check, close_fds=False)
+
+# One pooled HTTP session for all downloads, so repeated requests to GitHub reuse connections;
+# transient failures (connection errors, 429 and 5xx responses) to GET/HEAD are retried with backoff
+HTTP_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                   allowed_methods=frozenset({"GET", "HEAD"}))
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=HTTP_RETRY))
+
 # --- Phase Pre-A: Repacking ---
 
 def get_pkg_info(pkg_path):
     """Extract version and package ID from a .pkg file."""
+    # Memoized on (path, size, mtime) so the same pkg is only expanded once
+    try:
+        st = os.stat(pkg_path)
+    except OSError:
+        return None, None
+    return _get_pkg_info_cached(str(pkg_path), st.st_size, st.st_mtime_ns)
+
+def read_xar_metadata(pkg_path):
+    """
+    Read the top-level Distribution (or else PackageInfo) of a flat .pkg in-process.
+    A flat pkg is a xar archive: a fixed header, a zlib-compressed XML table of contents,
+    then a heap holding each member at a recorded offset. Only the TOC and the one small
+    member are read. Returns None if the file isn't xar or holds neither member.
+    """
+    with open(pkg_path, "rb") as f:
+        header = f.read(_XAR_HEADER.size)
+        if len(header) < _XAR_HEADER.size:
+            return None
+        magic, header_size, _, toc_compressed, _, _ = _XAR_HEADER.unpack(header)
+        if magic != b"xar!":
+            return None
+        f.seek(header_size)
+        toc = ET.fromstring(zlib.decompress(f.read(toc_compressed)))
+        heap_start = header_size + toc_compressed
+
+        members = {}
+        for entry in toc.iterfind("toc/file"):
+            name = entry.findtext("name")
+            data = entry.find("data")
+            if name in ("Distribution", "PackageInfo") and data is not None:
+                members[name] = data
+        data = members.get("Distribution", members.get("PackageInfo"))
+        if data is None:
+            return None
+
+        f.seek(heap_start + int(data.findtext("offset")))
+        raw = f.read(int(data.findtext("length")))
+        style = data.find("encoding").get("style", "") if data.find("encoding") is not None else ""
+        if style == "application/x-gzip":  # xar's "gzip" is a zlib stream
+            return zlib.decompress(raw)
+        if style == "application/x-bzip2":
+            return bz2.decompress(raw)
+        return raw
+
+@lru_cache(maxsize=64)
+def _get_pkg_info_cached(pkg_path, size, mtime_ns):
+    # Fast path: parse the xar TOC ourselves, no tool spawn or temp files
+    try:
+        content = read_xar_metadata(pkg_path)
+        if content:
+            return parse_pkg_metadata(content)
+    except (OSError, ValueError, zlib.error, ET.ParseError, TypeError):
+        pass
+
     try:
         with tempfile.TemporaryDirectory() as temp_dir:
             expand_dir = Path(temp_dir) / "expanded"
-            # pkgutil --expand
-            subprocess.run(["pkgutil", "--expand", str(pkg_path), str(expand_dir)], 
-                         check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            expand_dir.mkdir()
+            # A flat .pkg is a xar archive: extract only the metadata entries, not the payload
+            run_silent(["xar", "-xf", str(pkg_path), "-C", str(expand_dir), "Distribution", "PackageInfo"],
+                       check=False)
             
             # Look for Distribution or PackageInfo
             dist = expand_dir / "Distribution"
             pkg_info = expand_dir / "PackageInfo"
             
-            content = ""
+            if not dist.exists() and not pkg_info.exists():
+                # Fallback: full pkgutil --expand
+                shutil.rmtree(expand_dir)
+                run_silent(["pkgutil", "--expand", str(pkg_path), str(expand_dir)])
+
+            content = b""
             if dist.exists():
-                content = dist.read_text(errors="ignore")
+                content = dist.read_bytes()
             elif pkg_info.exists():
-                content = pkg_info.read_text(errors="ignore")
+                content = pkg_info.read_bytes()
                 
-            # Regex for version and id
-            v_match = re.search(r'version="([^"]+)"', content)
-            id_match = re.search(r'(?:id|pkgid)="([^"]+)"', content)
-            
-            version = v_match.group(1) if v_match else None
-            pkg_id = id_match.group(1) if id_match else None
-            
-            return version, pkg_id
+            return parse_pkg_metadata(content)
     except Exception:
         return None, None
 
+def parse_pkg_metadata(content):
+    """Return (version, pkg_id) from the bytes of a Distribution or PackageInfo file."""
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        root = None
+
+    if root is not None:
+        if root.tag == "pkg-info":
+            # <pkg-info identifier="..." version="...">
+            if root.get("version"):
+                return root.get("version"), root.get("identifier")
+        else:
+            # <installer-gui-script>: prefer <product>, then the first versioned <pkg-ref>
+            product = root.find("product")
+            if product is not None and product.get("version"):
+                return product.get("version"), product.get("id")
+            for ref in root.iter("pkg-ref"):
+                if ref.get("version"):
+                    return ref.get("version"), ref.get("id")
+
+    # Regex fallback for malformed XML
+    text = content.decode("utf-8", errors="ignore")
+    v_match = _PKG_VERSION_RE.search(text)
+    id_match = _PKG_ID_RE.search(text)
+    
+    version = v_match.group(1) if v_match else None
+    pkg_id = id_match.group(1) if id_match else None
+    
+    return version, pkg_id
+
+def clone_copy(src, dest):
+    """
+    Copy a file or directory tree, preferring APFS clones via 'cp -c' (copy-on-write, no data copied).
+    When cloning isn't possible (e.g. out of an HFS+ DMG mount) a single native 'ditto' does the
+    copy; shutil is the last resort, e.g. off macOS.
+    """
+    for cmd in (["cp", "-cR", str(src), str(dest)], ["ditto", str(src), str(dest)]):
+        try:
+            run_silent(cmd)
+            return
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            # Remove any partial output before retrying
+            if dest.is_dir() and not dest.is_symlink():
+                shutil.rmtree(dest, ignore_errors=True)
+            elif dest.exists() or dest.is_symlink():
+                dest.unlink()
+
+    if src.is_dir() and not src.is_symlink():
+        shutil.copytree(src, dest, symlinks=True)
+    else:
+        shutil.copy2(src, dest, follow_symlinks=False)
+
+def zip_artifact_prefix(names):
+    """
+    Member path of the shallowest .app/.pkg in a ZIP listing ("Foo.app", "dir/Bar.pkg", ...),
+    a .app winning over a .pkg at the same depth, skipping __MACOSX and dot entries like the
+    directory scan does; None if there is none.
+    """
+    best = None
+    for name in names:
+        parts = name.rstrip("/").split("/")
+        for depth, part in enumerate(parts):
+            if part.startswith(".") or part in _SCAN_SKIP_NAMES:
+                break
+            suffix = os.path.splitext(part)[1]
+            if suffix in (".app", ".pkg"):
+                candidate = (depth, suffix != ".app", "/".join(parts[:depth + 1]))
+                if best is None or candidate < best:
+                    best = candidate
+                break
+    return best[2] if best else None
+
+def extract_zip(zip_path, dest, overwrite=True, artifact_only=False):
+    """
+    Extract a ZIP in-process (no unzip fork), restoring unix permissions and symlinks,
+    which .app bundles depend on. Falls back to the unzip tool for archives zipfile
+    can't handle (e.g. encrypted or unsupported compression).
+    With artifact_only, a ZIP holding a .app/.pkg only has that bundle extracted
+    (docs, extras and other archives next to it are skipped).
+    """
+    dest = Path(dest)
+    prefix = None
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            infos = zf.infolist()
+            if artifact_only:
+                prefix = zip_artifact_prefix(i.filename for i in infos)
+                if prefix:
+                    infos = [i for i in infos
+                             if i.filename == prefix or i.filename.startswith(prefix + "/")]
+            links = [i for i in infos if stat.S_ISLNK(i.external_attr >> 16)]
+            files = [i for i in infos if not i.is_dir() and not stat.S_ISLNK(i.external_attr >> 16)]
+
+            for info in infos:
+                if info.is_dir():
+                    _extract_zip_member(zf, info, dest, overwrite)
+            _extract_zip_files(zf, files, dest, overwrite)
+            # Symlinks last, so no file write can be redirected through one
+            for info in links:
+                _extract_zip_member(zf, info, dest, overwrite, check_links=True)
+    except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+        print(f"    zipfile could not extract {Path(zip_path).name} ({e}), using unzip...")
+        # -o/-n: overwrite/never overwrite, -q: quiet
+        cmd = ["unzip", "-o" if overwrite else "-n", "-q", str(zip_path), "-d", str(dest)]
+        if prefix:
+            cmd += [prefix, prefix + "/*"]
+        subprocess.run(cmd, check=True)
+
+def _extract_zip_files(zf, infos, dest, overwrite):
+    """Extract regular file members, spread over threads for larger archives."""
+    if len(infos) < ZIP_PARALLEL_MIN_FILES:
+        for info in infos:
+            _extract_zip_member(zf, info, dest, overwrite)
+        return
+
+    # ZipFile objects aren't safe to share between threads; give each worker its own handle
+    local = threading.local()
+    handles = []
+
+    def extract(info):
+        handle = getattr(local, "zf", None)
+        if handle is None:
+            handle = local.zf = zipfile.ZipFile(zf.filename)
+            handles.append(handle)
+        _extract_zip_member(handle, info, dest, overwrite)
+
+    try:
+        # Biggest members first, so one large binary doesn't start last and hold up the pool
+        by_size = sorted(infos, key=lambda i: i.compress_size, reverse=True)
+        with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(infos))) as ex:
+            list(ex.map(extract, by_size))
+    finally:
+        for handle in handles:
+            handle.close()
+
+def _extract_zip_member(zf, info, dest, overwrite, check_links=False):
+    """Extract one ZipInfo below dest, keeping its unix mode / symlink-ness."""
+    root = os.path.abspath(dest)
+    target = os.path.normpath(os.path.join(root, info.filename))
+    if not target.startswith(root + os.sep):
+        return  # Never write outside dest (absolute paths, "..")
+    if check_links and not (os.path.realpath(os.path.dirname(target)) + os.sep).startswith(os.path.realpath(root) + os.sep):
+        return  # ...nor through a previously extracted symlink
+
+    if info.is_dir():
+        os.makedirs(target, exist_ok=True)
+        return
+
+    if os.path.lexists(target):
+        if not overwrite:
+            return
+        if os.path.isdir(target) and not os.path.islink(target):
+            return
+        os.unlink(target)  # Don't write through an existing symlink
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    mode = info.external_attr >> 16
+    if stat.S_ISLNK(mode):
+        os.symlink(zf.read(info).decode("utf-8"), target)
+        return
+
+    # Unbuffered target: copyfileobj already writes in large blocks
+    with open(target, "wb", buffering=0) as dst:
+        if info.file_size:
+            with zf.open(info) as src:
+                shutil.copyfileobj(src, dst, min(info.file_size, COPY_BUFSIZE))
+    if stat.S_IMODE(mode):
+        os.chmod(target, stat.S_IMODE(mode))
+
+@contextmanager
+def mounted_dmg(dmg_path, mount_point):
+    """
+    Attach dmg_path read-only at mount_point for the duration of the block, then detach it.
+    Holds one of MAX_MOUNTS slots while attached; raises RuntimeError if none frees up
+    within MOUNT_SLOT_TIMEOUT seconds.
+    """
+    if not _MOUNT_SLOTS.acquire(timeout=MOUNT_SLOT_TIMEOUT):
+        raise RuntimeError(f"No free mount slot for {dmg_path.name} after {MOUNT_SLOT_TIMEOUT}s "
+                           f"({MAX_MOUNTS} disk images already attached)")
+    try:
+        try:
+            subprocess.run([
+                "hdiutil", "attach", str(dmg_path),
+                "-mountpoint", str(mount_point),
+                "-nobrowse", "-quiet", "-noverify", "-noautoopen", "-readonly"
+            ], check=True, timeout=30, stdout=subprocess.DEVNULL) # Add timeout to prevent hangs
+        except subprocess.TimeoutExpired:
+            # The attach may still complete in the background
+            unmount_dmg(mount_point)
+            raise
+        try:
+            yield mount_point
+        finally:
+            unmount_dmg(mount_point)
+    finally:
+        _MOUNT_SLOTS.release()
+
 def unmount_dmg(mount_point):
     """Safely unmount a DMG, retrying if busy."""
-    for i in range(5):
-        res = subprocess.run(["hdiutil", "detach", str(mount_point), "-force", "-quiet"], capture_output=True)
+    # Exponential backoff (0.1s .. 1.6s): a briefly busy volume is retried almost at once,
+    # while a stubborn one still gets ~3s in total
+    for i in range(6):
+        res = run_silent(["hdiutil", "detach", str(mount_point), "-force", "-quiet"], check=False)
         if res.returncode == 0:
             return
-        time.sleep(1)
+        if i < 5:
+            time.sleep(0.1 * 2 ** i)
     print(f"Warning: Failed to detach {mount_point}")
 
-def recursive_find_app(search_dir, depth=0):
-    """Recursively search for .app bundles, unpacking ZIPs and DMGs as needed."""
+def list_dir(path, cache=None):
+    """os.scandir() listing of path as a list of DirEntry, memoized in cache (a dict) if given."""
+    if cache is not None and path in cache:
+        return cache[path]
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        entries = []
+    if cache is not None:
+        cache[path] = entries
+    return entries
+
+def scan_tree(root, cache=None):
+    """
+    Walk root once with os.scandir and bucket entries by suffix (.app/.pkg/.zip/.dmg).
+    Skips dotfiles (incl. AppleDouble ._ files) and __MACOSX, and never descends into bundles
+    (.app, .pkg, .framework, ...), whose contents can't be the artifact we're after.
+    Returns {suffix: [path_str, ...]}, each list ordered shallowest first.
+    """
+    found = {".app": [], ".pkg": [], ".zip": [], ".dmg": []}
+    # Breadth-first, so every list comes out in depth order without a sort
+    queue = deque([str(root)])
+    while queue:
+        for entry in list_dir(queue.popleft(), cache):
+            name = entry.name
+            if name.startswith(".") or name in _SCAN_SKIP_NAMES:
+                continue
+            suffix = os.path.splitext(name)[1]
+            if suffix in found:
+                found[suffix].append(entry.path)
+            # DirEntry caches the type, so this costs no extra stat()
+            if suffix not in _BUNDLE_SUFFIXES and entry.is_dir(follow_symlinks=False):
+                queue.append(entry.path)
+    return found
+
+def find_shallow_artifact(root, max_depth=1, cache=None):
+    """
+    Breadth-first look for a .app/.pkg in root and up to max_depth levels below it.
+    Returns the shallowest match as a Path (a .app over a .pkg at the same depth, e.g. an
+    app next to its uninstaller pkg), or None.
+    """
+    level = [str(root)]
+    for _ in range(max_depth + 1):
+        next_level = []
+        matches = []
+        for directory in level:
+            for entry in sorted(list_dir(directory, cache), key=lambda e: e.name):
+                if entry.name.startswith(".") or entry.name in _SCAN_SKIP_NAMES:
+                    continue
+                suffix = os.path.splitext(entry.name)[1]
+                if suffix in (".app", ".pkg"):
+                    matches.append((suffix != ".app", entry.path))
+                elif suffix not in _BUNDLE_SUFFIXES and entry.is_dir(follow_symlinks=False):
+                    next_level.append(entry.path)
+        if matches:
+            # min() is stable: first .app in walk order, else first .pkg
+            return Path(min(matches, key=lambda m: m[0])[1])
+        level = next_level
+    return None
+
+def find_artifact(search_dir):
+    """
+    Find the shallowest .app/.pkg under search_dir without unpacking anything.
+    Returns (artifact_path_or_None, tree); tree is the scan_tree() result (None on the fast path)
+    so callers can look for nested archives.
+    """
+    # Listings from the fast path are reused by the full walk, so no directory is read twice
+    cache = {}
+
+    # Fast path: DMG roots and ZIPs almost always hold the app at the top level or one below
+    found = find_shallow_artifact(search_dir, cache=cache)
+    if found:
+        return found, None
+
+    # Single walk of the tree; hidden files, __MACOSX and .app contents
+    # (e.g. Contents/Resources/install.pkg) are already filtered out
+    tree = scan_tree(search_dir, cache)
+    # Both lists are already in depth order; merging lazily yields the shallowest without a sort
+    shallowest = next(heapq.merge(tree[".app"], tree[".pkg"], key=lambda p: p.count(os.sep)), None)
+    return (Path(shallowest) if shallowest else None), tree
+
+def recursive_find_app(search_dir, depth=0, mounts=None):
+    """
+    Recursively search for .app bundles, unpacking ZIPs and DMGs as needed.
+    If mounts (an ExitStack) is given, a DMG holding the artifact is left attached on it
+    and the artifact is returned from the read-only mount instead of being copied out;
+    the caller detaches by closing the stack once done with the artifact. Every other DMG
+    is detached as soon as its contents have been scanned or copied out.
+    """
     if depth > 3:  # Prevent excessive recursion
         return None
         
     print(f"    [Depth {depth}] Scanning {search_dir.name}...")
 
-    # 1. Check for .app or .pkg directly using rglob
-    # We sort by length to find the shallowest/shortest path first
-    artifacts = sorted(list(search_dir.rglob("*.app")) + list(search_dir.rglob("*.pkg")), key=lambda p: len(p.parts))
-    
-    # Filter out pkgs inside .app (e.g. Contents/Resources/install.pkg)
-    final_artifacts = []
-    for art in artifacts:
-        # Filter out AppleDouble files and __MACOSX garbage
-        if art.name.startswith("._") or "__MACOSX" in str(art):
-            continue
-            
-        if ".app/" in str(art) and art.suffix == ".pkg":
-            continue
-        # Also ignore dotfiles
-        if "/." in str(art):
-            continue
-        final_artifacts.append(art)
-        
-    if final_artifacts:
-        print(f"    Found artifact: {final_artifacts[0].name}")
-        return final_artifacts[0]
+    # 1. Check for .app or .pkg directly
+    found, tree = find_artifact(search_dir)
+    if found:
+        print(f"    Found artifact: {found.name}")
+        return found
 
     # 2. Look for archives to unpack (ZIP)
-    # Use rglob to find nested archives
-    zips = list(search_dir.rglob("*.zip"))
-    for zip_file in zips:
-        # Avoid processing items inside an already found app or hidden folders
-        if ".app/" in str(zip_file) or "/." in str(zip_file): continue
-        
+    for zip_path in tree[".zip"]:
+        zip_file = Path(zip_path)
         extract_dir = zip_file.parent / f"ext_zip_{zip_file.stem}"
-        if extract_dir.exists(): continue 
-        extract_dir.mkdir(parents=True, exist_ok=True)
+        # mkdir doubles as the "already unpacked" check: one syscall instead of stat + mkdir
+        try:
+            extract_dir.mkdir()
+        except FileExistsError:
+            continue
         
         print(f"    Unzipping {zip_file.name}...")
         try:
-            # -n: never overwrite, -q: quiet
-            subprocess.run(["unzip", "-n", "-q", str(zip_file), "-d", str(extract_dir)], check=True)
-            found = recursive_find_app(extract_dir, depth + 1)
+            extract_zip(zip_file, extract_dir, overwrite=False, artifact_only=True)
+            found = recursive_find_app(extract_dir, depth + 1, mounts)
             if found: return found
         except Exception as e:
             print(f"    Warning: Failed to unzip {zip_file.name}: {e}")
 
     # 3. Look for archives to unpack (DMG)
-    dmgs = list(search_dir.rglob("*.dmg"))
-    for dmg_file in dmgs:
-        if ".app/" in str(dmg_file) or "/." in str(dmg_file): continue
-        
+    for dmg_path in tree[".dmg"]:
+        dmg_file = Path(dmg_path)
         extract_dir = dmg_file.parent / f"ext_dmg_{dmg_file.stem}"
-        if extract_dir.exists(): continue
-        extract_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            extract_dir.mkdir()
+        except FileExistsError:
+            continue
         
         mount_point = dmg_file.parent / f"mnt_{dmg_file.stem}"
         mount_point.mkdir(exist_ok=True)
         
         print(f"    Mounting {dmg_file.name}...")
         try:
-            # Mount
-            subprocess.run([
-                "hdiutil", "attach", str(dmg_file), 
-                "-mountpoint", str(mount_point), 
-                "-nobrowse", "-quiet", "-noverify", "-noautoopen"
-            ], check=True, timeout=30) # Add timeout to prevent hangs
-            
-            # Copy contents
-            print(f"    Copying contents from {dmg_file.name}...")
-            for item in mount_point.iterdir():
-                if item.name.startswith("."): continue
-                # Skip symlinks to /Applications to avoid copying system apps
-                if item.is_symlink() and str(item.readlink()) == "/Applications": continue
-                
-                dest = extract_dir / item.name
-                if dest.exists(): continue
-                
-                try:
-                    if item.is_dir():
-                        shutil.copytree(item, dest, symlinks=True)
-                    else:
-                        shutil.copy2(item, dest)
-                except Exception as cp_err:
-                    print(f"    Warning: Failed to copy {item.name}: {cp_err}")
-            
-            unmount_dmg(mount_point)
+            with ExitStack() as local:
+                local.enter_context(mounted_dmg(dmg_file, mount_point))
+                # Scan the mounted volume in place and copy out only what we need:
+                # the artifact itself, or failing that, any nested archives.
+                # (The /Applications symlink never matches, so it is not copied.)
+                artifact, mount_tree = find_artifact(mount_point)
+                if artifact and mounts is not None:
+                    print(f"    Found artifact: {artifact.name} (using mounted volume)")
+                    # Hand this mount over to the caller; it stays attached after we return
+                    mounts.enter_context(local.pop_all())
+                    return artifact
+                if artifact:
+                    to_copy = [artifact]
+                else:
+                    to_copy = [Path(p) for p in mount_tree[".zip"] + mount_tree[".dmg"]]
+
+                print(f"    Copying {len(to_copy)} item(s) from {dmg_file.name}...")
+                for item in to_copy:
+                    dest = extract_dir / item.name
+                    if dest.exists(): continue
+                    
+                    try:
+                        clone_copy(item, dest)
+                    except Exception as cp_err:
+                        print(f"    Warning: Failed to copy {item.name}: {cp_err}")
             
-            # Recurse
-            found = recursive_find_app(extract_dir, depth + 1)
+            if artifact:
+                found = extract_dir / artifact.name
+                if found.exists():
+                    print(f"    Found artifact: {found.name}")
+                    return found
+                continue
+
+            # Recurse into nested archives
+            found = recursive_find_app(extract_dir, depth + 1, mounts)
             if found: return found
             
         except subprocess.TimeoutExpired:
              print(f"    Error: Timeout mounting {dmg_file.name}")
-             unmount_dmg(mount_point)
         except Exception as e:
             print(f"    Failed to process DMG {dmg_file.name}: {e}")
-            if mount_point.exists():
-                unmount_dmg(mount_point)
 
     return None
 
+def read_bundle_info(info_plist):
+    """
+    Return (name, version) from an Info.plist.
+    XML plists are scanned with a regex for just the bundle keys; binary plists,
+    or XML where a key is missing, go through a full plistlib parse.
+    """
+    data = Path(info_plist).read_bytes()
+    if not data.startswith(b"bplist00"):
+        keys = {}
+        for key, value in _PLIST_BUNDLE_KEYS_RE.findall(data.decode("utf-8", "replace")):
+            keys.setdefault(key, xml_unescape(value, _XML_QUOTE_ENTITIES).strip())
+        name = keys.get("CFBundleName") or keys.get("CFBundleDisplayName")
+        version = keys.get("CFBundleShortVersionString") or keys.get("CFBundleVersion")
+        if name and version:
+            return name, version
+
+    return bundle_name_version(plistlib.loads(data))
+
+def bundle_name_version(plist):
+    """(name, version) from a parsed Info.plist dict, with the usual key fallbacks."""
+    name = plist.get("CFBundleName") or plist.get("CFBundleDisplayName")
+    version = plist.get("CFBundleShortVersionString") or plist.get("CFBundleVersion")
+    return name, version
+
+@lru_cache(maxsize=None)
+def dmg_format_args():
+    """
+    hdiutil create format options: LZFSE (ULFO) on macOS 10.11+, which is faster to create
+    and smaller than zlib on both Apple Silicon and Intel, otherwise UDZO at the fastest
+    zlib level. Computed once; platform.mac_ver() reads SystemVersion.plist on every call.
+    """
+    mac_ver = platform.mac_ver()[0]
+    try:
+        if mac_ver and tuple(int(x) for x in mac_ver.split(".")[:2]) >= (10, 11):
+            return ("-format", "ULFO")
+    except ValueError:
+        pass
+    return ("-format", "UDZO", "-imagekey", "zlib-level=1")
+
+def create_dmg(src, volname, out_path):
+    """
+    Build a compressed DMG of src at out_path.
+    With DMG_TWO_STEP=1 the image is first written uncompressed (UDRO) and then
+    compressed by `hdiutil convert`, which can be faster for large bundles on some
+    hosts; by default hdiutil compresses while creating.
+    """
+    if os.getenv("DMG_TWO_STEP") != "1":
+        subprocess.run(["hdiutil", "create", "-volname", volname, "-srcfolder", str(src),
+                        "-ov", *dmg_format_args(), str(out_path)],
+                       check=True, stdout=subprocess.DEVNULL)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = os.path.join(tmp, "raw.dmg")
+        subprocess.run(["hdiutil", "create", "-volname", volname, "-srcfolder", str(src),
+                        "-format", "UDRO", raw],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(["hdiutil", "convert", raw, *dmg_format_args(), "-ov", "-o", str(out_path)],
+                       check=True, stdout=subprocess.DEVNULL)
+
+def single_app_dmg_info(dmg_path, mount_point):
+    """
+    If the DMG's root holds exactly one .app and no other artifact or archive (dotfiles,
+    symlinks such as the /Applications alias, and plain files like a README are fine),
+    return that app's (name, version, app_dir_name, is_verified); otherwise None.
+    is_verified is None if spctl couldn't be run.
+    """
+    with mounted_dmg(dmg_path, mount_point):
+        with os.scandir(mount_point) as it:
+            entries = [e for e in it if not e.name.startswith(".") and not e.is_symlink()
+                       and os.path.splitext(e.name)[1] in (".app", ".pkg", ".zip", ".dmg")]
+        if len(entries) != 1 or not entries[0].name.endswith(".app") or not entries[0].is_dir():
+            return None
+        try:
+            name, version = read_bundle_info(Path(entries[0].path) / "Contents" / "Info.plist")
+        except Exception:
+            return None
+        if not (name and version):
+            return None
+        # Assess while it's mounted anyway, so Phase C can skip attaching this image again
+        try:
+            is_verified = assess_app(entries[0].path)
+        except OSError:
+            is_verified = None
+    return name, version, entries[0].name, is_verified
+
 def try_repack(file_path):
     """Attempt to unpack a file, find an app, and repack it into a standard DMG."""
-    with tempfile.TemporaryDirectory() as temp_dir:
+    # mounts is closed first, detaching any DMG the artifact is read from before the temp dir goes
+    with tempfile.TemporaryDirectory() as temp_dir, ExitStack() as mounts:
         temp_path = Path(temp_dir)
-        work_file = temp_path / file_path.name
-        shutil.copy2(file_path, work_file)
-        
+
+        # A vendor DMG that already holds just the app only needs a compliant name;
+        # renaming it in place avoids re-compressing (or even copying) the image
+        if file_path.suffix.lower() == ".dmg":
+            mount_point = temp_path / "mnt_src"
+            mount_point.mkdir()
+            try:
+                info = single_app_dmg_info(file_path, mount_point)
+            except (subprocess.SubprocessError, OSError, RuntimeError) as e:
+                print(f"  Warning: Could not inspect {file_path.name}: {e}")
+                info = None
+            if info:
+                app_name, version, app_dir_name, is_verified = info
+                new_file_path = UPLOAD_DIR / f"{sanitize_name(app_name)}-{version}.dmg"
+                print(f"  Single-app DMG, renaming to {new_file_path.name}...")
+                os.replace(file_path, new_file_path)
+                if is_verified is not None:
+                    remember_verification(new_file_path, is_verified, app_dir_name)
+                return new_file_path
+
         print(f"  Searching for .app in {file_path.name}...")
-        # Since work_file is in temp_path, we can just search temp_path after basic extraction if it's an archive
-        # Or pass the file to recursive finder if we treat the file itself as the root to explore?
         # recursive_find_app expects a directory.
         
         # Initial extraction of the main file
@@ -191,15 +766,20 @@ def try_repack(file_path):
         work_extract_dir.mkdir()
         
         if file_path.suffix.lower() == ".zip":
-            subprocess.run(["unzip", "-q", str(work_file), "-d", str(work_extract_dir)], check=True)
+            # Only read from the upload, so extract straight from it
+            extract_zip(file_path, work_extract_dir, artifact_only=True)
         elif file_path.suffix.lower() == ".dmg":
-            # treat as DMG found inside
-            # Just move it to the extract dir so recursive finder picks it up
-            shutil.move(work_file, work_extract_dir / file_path.name)
+            # treat as DMG found inside: link it into the extract dir so recursive finder picks it up
+            # (hdiutil only reads it; a hard link costs nothing, cloning covers other volumes)
+            work_file = work_extract_dir / file_path.name
+            try:
+                os.link(file_path, work_file)
+            except OSError:
+                clone_copy(file_path, work_file)
         else:
             return None
             
-        found_artifact = recursive_find_app(work_extract_dir)
+        found_artifact = recursive_find_app(work_extract_dir, mounts=mounts)
         
         if not found_artifact:
             return None
@@ -222,14 +802,14 @@ def try_repack(file_path):
                 
             if not version:
                  # Try to extract version from filename if it looks like Name-1.2.3.pkg
-                 m = re.search(r'-(\d+\.\d+\.\d+)', found_artifact.name)
+                 m = _VER_IN_NAME_RE.search(found_artifact.name)
                  if m:
                      version = m.group(1)
                      app_name = found_artifact.name[:m.start()]
             
             if not version:
                 # Try original filename
-                m = re.search(r'-(\d+\.\d+\.\d+)', file_path.name)
+                m = _VER_IN_NAME_RE.search(file_path.name)
                 if m:
                      version = m.group(1)
                      # App Name is start of string
@@ -241,12 +821,19 @@ def try_repack(file_path):
                 print("  Error: Could not determine version for .pkg.")
                 return None
                 
-            safe_name = re.sub(r'[^a-zA-Z0-9]', '', app_name)
+            safe_name = sanitize_name(app_name)
             new_filename = f"{safe_name}-{version}.pkg"
             new_file_path = UPLOAD_DIR / new_filename
             
             print(f"  Repacking (renaming) to {new_filename}...")
-            shutil.copy2(found_artifact, new_file_path)
+            # A flat pkg extracted into the temp dir can just gain a second name in upload/;
+            # across volumes, from a mount, or for bundle-style pkgs, clone/copy it instead
+            try:
+                if new_file_path.exists():
+                    new_file_path.unlink()
+                os.link(found_artifact, new_file_path)
+            except OSError:
+                clone_copy(found_artifact, new_file_path)
             return new_file_path
 
         # Handle .app
@@ -259,40 +846,26 @@ def try_repack(file_path):
         app_name = None
         version = None
         
-        # Method 1: plistlib
+        # Method 1: Info.plist contents (regex fast path for XML, plistlib otherwise)
         try:
-            with open(info_plist, "rb") as f:
-                plist = plistlib.load(f)
-                app_name = plist.get("CFBundleName") or plist.get("CFBundleDisplayName")
-                version = plist.get("CFBundleShortVersionString") or plist.get("CFBundleVersion")
-                
-                # if not app_name or not version:
-                #      print(f"  Debug: plistlib loaded. Name={app_name}, Version={version}")
+            app_name, version = read_bundle_info(info_plist)
         except Exception as e:
             print(f"  Warning: plistlib failed: {e}")
 
-        # Method 2: defaults read (fallback)
+        # Method 2: let plutil normalize the plist (one process for both keys)
         if not app_name or not version:
-            print(f"  Missing metadata (Name={app_name}, Version={version}). Trying 'defaults read'...")
+            print(f"  Missing metadata (Name={app_name}, Version={version}). Trying 'plutil'...")
             try:
-                # Ensure path is absolute and properly formatted
-                plist_path = str(info_plist.resolve())
-                
-                if not app_name:
-                     res_name = subprocess.run(["defaults", "read", plist_path, "CFBundleName"], capture_output=True, text=True)
-                     if res_name.returncode == 0: 
-                        app_name = res_name.stdout.strip()
-                     else:
-                        print(f"    defaults read CFBundleName failed: {res_name.stderr.strip()}")
-                         
-                if not version:
-                     res_ver = subprocess.run(["defaults", "read", plist_path, "CFBundleShortVersionString"], capture_output=True, text=True)
-                     if res_ver.returncode == 0: 
-                        version = res_ver.stdout.strip()
-                     else:
-                        print(f"    defaults read CFBundleShortVersionString failed: {res_ver.stderr.strip()}")
+                res = subprocess.run(["plutil", "-convert", "xml1", "-o", "-", str(info_plist.resolve())],
+                                     capture_output=True)
+                if res.returncode == 0:
+                    name, ver = bundle_name_version(plistlib.loads(res.stdout))
+                    app_name = app_name or name
+                    version = version or ver
+                else:
+                    print(f"    plutil failed: {res.stderr.decode(errors='replace').strip()}")
             except Exception as e:
-                print(f"  Warning: defaults read failed: {e}")
+                print(f"  Warning: plutil failed: {e}")
 
         # Fallback Name from filename
         if not app_name:
@@ -304,59 +877,102 @@ def try_repack(file_path):
             return None
             
         # Sanitize name
-        safe_name = re.sub(r'[^a-zA-Z0-9]', '', app_name)
+        safe_name = sanitize_name(app_name)
         new_filename = f"{safe_name}-{version}.dmg"
         new_file_path = UPLOAD_DIR / new_filename
         
         print(f"  Repacking to {new_filename}...")
         
         # Create DMG
-        # hdiutil create -volname "AppName" -srcfolder "path/to/App.app" -ov -format UDZO "path/to/output.dmg"
-        cmd = [
-            "hdiutil", "create",
-            "-volname", app_name,
-            "-srcfolder", str(found_artifact),
-            "-ov",
-            "-format", "UDZO",
-            str(new_file_path)
-        ]
-        
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        # hdiutil create -volname "AppName" -srcfolder "path/to/App.app" -ov -format ULFO "path/to/output.dmg"
+        create_dmg(found_artifact, app_name, new_file_path)
+        # The new image holds exactly this bundle at its root; assess it here rather than
+        # attaching the DMG again for is_app_verified
+        try:
+            remember_verification(new_file_path, assess_app(found_artifact), found_artifact.name)
+        except OSError:
+            pass
         return new_file_path
 
-def preprocess_files():
-    """Scan upload folder for non-compliant files and try to repack them."""
+def list_upload_files():
+    """Regular (or symlinked) non-hidden files in upload/, as Paths."""
+    # scandir's DirEntry answers is_file() from the directory entry without a stat()
+    with os.scandir(UPLOAD_DIR) as it:
+        return [Path(e.path) for e in it if e.is_file() and not e.name.startswith(".")]
+
+def preprocess_files(on_ready=None):
+    """
+    Scan upload folder for non-compliant files and try to repack them.
+    Returns the files in upload/ afterwards (repacked outputs replace their
+    sources), so scan_upload_folder() doesn't have to list the folder again.
+    on_ready(path), if given, is called for each compliant file as soon as it is
+    final: existing ones up front, repacked ones as their repack finishes.
+    """
     print("Preprocessing files in upload/...")
     # List files to avoid modification during iteration issues
-    files = list(UPLOAD_DIR.iterdir())
+    files = list_upload_files()
+    result = {file_path.name: file_path for file_path in files}
     
+    candidates = []
     for file_path in files:
-        if file_path.name.startswith("."): continue
-        if not file_path.is_file(): continue
-        
         # If matches correct pattern, skip
         if FILENAME_PATTERN.match(file_path.name):
+            if on_ready:
+                on_ready(file_path)
             continue
             
         # If it's a candidate for repacking (Zip or DMG)
         if file_path.suffix.lower() in ['.zip', '.dmg']:
             print(f"Attempting to repack: {file_path.name}")
+            candidates.append(file_path)
+
+    if not candidates:
+        return files
+
+    # Repacking is mostly waiting on unzip/hdiutil, so threads are enough to overlap files
+    with ThreadPoolExecutor(max_workers=REPACK_WORKERS) as ex:
+        futures = {ex.submit(try_repack, file_path): file_path for file_path in candidates}
+        for future in as_completed(futures):
+            file_path = futures[future]
             try:
-                new_dmg = try_repack(file_path)
+                new_dmg = future.result()
                 if new_dmg:
                     print(f"Successfully repacked to: {new_dmg.name}")
-                    # Remove original
-                    file_path.unlink()
+                    # Remove original (already gone if it was renamed into place)
+                    file_path.unlink(missing_ok=True)
+                    del result[file_path.name]
+                    result[new_dmg.name] = new_dmg
+                    if on_ready:
+                        on_ready(new_dmg)
                 else:
                     print(f"Skipping {file_path.name}: Could not extract valid .app")
             except Exception as e:
                 print(f"Error repacking {file_path.name}: {e}")
 
+    return list(result.values())
+
 # --- Phase A: Validation & Setup ---
 
+def load_env_file(env_file):
+    """Minimal .env loader; existing environment variables take precedence."""
+    if not env_file.exists():
+        return
+    for line in env_file.read_text(errors="ignore").splitlines():
+        match = _ENV_LINE_RE.match(line)
+        if not match:
+            continue
+        key, value = match.groups()
+        quoted = _ENV_QUOTED_RE.match(value)
+        if quoted:
+            value = quoted.group(2)
+        else:
+            # Drop inline comments on unquoted values
+            value = value.split(" #", 1)[0].rstrip()
+        os.environ.setdefault(key, value)
+
 def setup_environment():
     """Load environment variables and validate tokens."""
-    load_dotenv(ENV_FILE)
+    load_env_file(ENV_FILE)
     token = os.getenv("GITHUB_TOKEN")
     if not token:
         print("Error: GITHUB_TOKEN not found in .env or environment variables.")
@@ -365,14 +981,12 @@ def setup_environment():
     # Optional: Get Repository Name from .env or git config
     repo_name = os.getenv("GITHUB_REPOSITORY")
     if not repo_name:
-        try:
-            remote_url = subprocess.check_output(["git", "config", "--get", "remote.origin.url"]).decode().strip()
+        remote_url = read_origin_url()
+        if remote_url:
             # extract user/repo from git@github.com:user/repo.git or https://github.com/user/repo.git
-            match = re.search(r"github\.com[:/](.+?)/(.+?)(\.git)?$", remote_url)
+            match = _GITHUB_REMOTE_RE.search(remote_url)
             if match:
                 repo_name = f"{match.group(1)}/{match.group(2)}"
-        except subprocess.CalledProcessError:
-            pass
             
     if not repo_name:
         print("Error: Could not determine GITHUB_REPOSITORY from .env or git remote.")
@@ -380,9 +994,27 @@ def setup_environment():
         
     return token, repo_name
 
-def scan_upload_folder():
-    """Scan upload/ folder and validate filenames."""
-    files = [f for f in UPLOAD_DIR.iterdir() if f.is_file() and not f.name.startswith(".")]
+def read_origin_url():
+    """Return remote.origin.url, reading .git/config directly to avoid spawning git."""
+    try:
+        config = (WORKSPACE_ROOT / ".git" / "config").read_text(errors="ignore")
+        section = _GIT_ORIGIN_SECTION_RE.search(config)
+        match = section and _GIT_URL_LINE_RE.search(section.group(1))
+        if match:
+            return match.group(1)
+    except OSError:
+        pass
+
+    # Fallback (e.g. worktrees where .git is a file)
+    try:
+        return subprocess.check_output(["git", "config", "--get", "remote.origin.url"]).decode().strip()
+    except subprocess.CalledProcessError:
+        return None
+
+def scan_upload_folder(files=None):
+    """Scan upload/ folder (or the given file list, e.g. from preprocess_files) and validate filenames."""
+    if files is None:
+        files = list_upload_files()
     valid_files = []
     
     if not files:
@@ -392,36 +1024,52 @@ def scan_upload_folder():
     print(f"Found {len(files)} files in upload/...")
 
     for file_path in files:
-        match = FILENAME_PATTERN.match(file_path.name)
-        if not match:
+        file_info = upload_file_info(file_path)
+        if not file_info:
             print(f"Warning: Invalid filename '{file_path.name}'. Skipping.")
             print("  Must match format 'AppName-Version.ext' (e.g., MyTool-1.0.2.dmg)")
             continue
-        
-        valid_files.append({
-            "path": file_path,
-            "name": match.group("name"),
-            "version": match.group("version"),
-            "ext": match.group("ext"),
-            "filename": file_path.name
-        })
+        valid_files.append(file_info)
         
     return valid_files
 
+def upload_file_info(file_path):
+    """valid_files entry for an upload, or None if its name doesn't match FILENAME_PATTERN."""
+    match = FILENAME_PATTERN.match(file_path.name)
+    if not match:
+        return None
+    return {
+        "path": file_path,
+        "name": match.group("name"),
+        "version": match.group("version"),
+        "ext": match.group("ext"),
+        "filename": file_path.name,
+        # Computed once here; version bump and cask processing both key on it
+        "cask_token": camel_to_kebab(match.group("name")),
+    }
+
 # --- Phase B: Versioning Strategy ---
 
 def load_state():
     if STATE_FILE.exists():
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
+        return json.loads(STATE_FILE.read_bytes())
     return {"version": "0.0.0", "history": []}
 
 def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=4)
-
-def determine_version_bump(valid_files, updated_apps_info, current_version_str, force_major=False):
-    """Determine the new repository release version."""
+    # Keep the file (and every load/save) bounded as releases accumulate
+    del state["history"][:-STATE_HISTORY_LIMIT]
+    # Serialize in memory and write once; json.dump streams many small writes
+    STATE_FILE.write_text(json.dumps(state, indent=4), encoding="utf-8")
+
+def existing_cask_tokens():
+    """Return the set of cask tokens (file stems) present in Casks/."""
+    if not CASKS_DIR.exists():
+        return set()
+    with os.scandir(CASKS_DIR) as it:
+        return {e.name[:-3] for e in it if e.name.endswith(".rb")}
+
+def determine_version_bump(valid_files, updated_apps_info, current_version_str, force_major=False, existing=None):
+    """Determine the new repository release version. existing: cask tokens, as from existing_cask_tokens()."""
     current_ver = Version(current_version_str)
     
     if force_major:
@@ -429,11 +1077,11 @@ def determine_version_bump(valid_files, updated_apps_info, current_version_str,
 
     is_minor_bump = False
     
-    # Check local uploads
+    # Check local uploads against one listing of Casks/ instead of a stat() per file
+    if existing is None:
+        existing = existing_cask_tokens()
     for file_info in valid_files:
-        cask_token = camel_to_kebab(file_info["name"])
-        cask_path = CASKS_DIR / f"{cask_token}.rb"
-        if not cask_path.exists():
+        if file_info["cask_token"] not in existing:
             is_minor_bump = True
             break
 
@@ -453,21 +1101,56 @@ def determine_version_bump(valid_files, updated_apps_info, current_version_str,
         
     return current_ver
 
+@lru_cache(maxsize=256)
 def camel_to_kebab(name):
     """Convert CamelCase to kebab-case (e.g. MyTool -> my-tool)."""
-    # Simple regex to handle camel case
-    s1 = re.sub('(.)([A-Z][a-z]+)', r'\1-\2', name)
-    return re.sub('([a-z0-9])([A-Z])', r'\1-\2', s1).lower()
+    return _CAMEL_BOUNDARY_RE.sub("-", name).lower()
+
+@lru_cache(maxsize=256)
+def sanitize_name(name):
+    """App name reduced to the [a-zA-Z0-9] characters FILENAME_PATTERN allows."""
+    return _NON_ALNUM_RE.sub('', name)
 
 # --- Phase C: Processing & SHA Calculation ---
 
 def calculate_sha256(file_path):
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
+    """SHA256 hex digest of a local file."""
+    # Unbuffered: file_digest reads into its own buffer, BufferedReader would add a copy
+    with open(file_path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            # Linux CI: hint sequential access so the kernel reads ahead aggressively
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        # file_digest (3.11+) runs the whole readinto/update loop in C
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha256_hash = hashlib.sha256()
+        try:
+            # Hand the whole file to OpenSSL as one buffer, paged in by the kernel
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, "madvise"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                sha256_hash.update(mm)
+            return sha256_hash.hexdigest()
+        except (ValueError, OSError):
+            # Empty files can't be mapped; also covers mmap failures
+            pass
+        for byte_block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
+def assess_app(app_path):
+    """spctl execute assessment of an .app bundle (signed and notarized)."""
+    res = run_silent(["spctl", "--assess", "--type", "execute", "--verbose", str(app_path)], check=False)
+    return res.returncode == 0
+
+def _verification_key(dmg_path):
+    st = os.stat(dmg_path)
+    return (os.path.abspath(dmg_path), st.st_size, st.st_mtime_ns)
+
+def remember_verification(dmg_path, is_verified, app_name):
+    """Record is_app_verified's answer for a DMG whose app was assessed while repacking."""
+    _VERIFY_CACHE[_verification_key(dmg_path)] = (is_verified, app_name)
+
 def is_app_verified(artifact_path):
     """
     Check if the app is verified (signed and notarized) using spctl.
@@ -476,38 +1159,38 @@ def is_app_verified(artifact_path):
     print(f"Verifying signature for {artifact_path.name}...")
     if artifact_path.suffix.lower() == ".pkg":
         try:
-            res = subprocess.run(["spctl", "--assess", "--type", "install", "--verbose", str(artifact_path)], 
-                               capture_output=True)
+            res = run_silent(["spctl", "--assess", "--type", "install", "--verbose", str(artifact_path)],
+                             check=False)
             return (res.returncode == 0, None)
         except Exception:
             return (False, None)
             
     if artifact_path.suffix.lower() == ".dmg":
+        try:
+            cached = _VERIFY_CACHE.get(_verification_key(artifact_path))
+        except OSError:
+            cached = None
+        if cached:
+            return cached
+
         is_verified = False
         app_name = None
         mount_point = Path(tempfile.mkdtemp())
         try:
-            subprocess.run([
-                "hdiutil", "attach", str(artifact_path), 
-                "-mountpoint", str(mount_point), 
-                "-nobrowse", "-quiet", "-noverify", "-noautoopen"
-            ], check=True, timeout=30, stdout=subprocess.DEVNULL)
-            
-            # Find app
-            apps = list(mount_point.glob("*.app"))
-            if apps:
-                app_path = apps[0]
-                app_name = app_path.name # "Macs Fan Control.app"
-                
-                # spctl check
-                res = subprocess.run(["spctl", "--assess", "--type", "execute", "--verbose", str(app_path)], 
-                                   capture_output=True)
-                if res.returncode == 0:
-                    is_verified = True
+            with mounted_dmg(artifact_path, mount_point):
+                # Find app: only the volume root matters, one readdir with cached entry types
+                with os.scandir(mount_point) as it:
+                    app_path = next((Path(e.path) for e in it
+                                     if e.name.endswith(".app") and not e.name.startswith(".")
+                                     and e.is_dir(follow_symlinks=False)), None)
+                if app_path:
+                    app_name = app_path.name # "Macs Fan Control.app"
+                    
+                    # spctl check
+                    is_verified = assess_app(app_path)
         except Exception as e:
             print(f"  Error checking signature: {e}")
         finally:
-             unmount_dmg(mount_point)
              try:
                 mount_point.rmdir()
              except: pass
@@ -553,17 +1236,103 @@ def get_cask_template(token, name, version, sha256, url, homepage_url, artifact_
 end
 """
 
-def process_casks(valid_files, new_repo_version, repo_name):
-    """Update or Create Casks."""
+def upload_stat(file_info):
+    """stat() of an upload, taken once and kept on its file_info."""
+    st = file_info.get("stat")
+    if st is None:
+        st = file_info["stat"] = file_info["path"].stat()
+    return st
+
+def sha_cache_key(file_info):
+    """Cache key for a file's SHA256: name, version, size and mtime."""
+    st = upload_stat(file_info)
+    return f"{file_info['name']}-{file_info['version']}-{st.st_size}-{st.st_mtime_ns}"
+
+def load_sha_cache():
+    """{sha_cache_key: sha256} for uploads hashed by earlier runs on this machine."""
+    try:
+        return json.loads(SHA_CACHE.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+def save_sha_cache(cache):
+    SHA_CACHE.write_text(json.dumps(cache, indent=1), encoding="utf-8")
+
+def start_hashing(valid_files, executor, sha_cache=None):
+    """
+    Submit SHA256 jobs for all files; returns {filename: Future}.
+    If sha_cache (load_sha_cache()) is given, hits skip hashing and new results are stored in it.
+    """
+    futures = {}
+    # Largest first, so the longest hash starts immediately instead of trailing at the end
+    for file_info in sorted(valid_files, key=lambda fi: upload_stat(fi).st_size, reverse=True):
+        key = sha_cache_key(file_info)
+        if sha_cache is not None and key in sha_cache:
+            print(f"Using cached SHA256 for {file_info['filename']}")
+            future = Future()
+            future.set_result(sha_cache[key])
+        else:
+            future = executor.submit(calculate_sha256, file_info["path"])
+            if sha_cache is not None:
+                def store(fut, key=key):
+                    if not fut.exception():
+                        sha_cache[key] = fut.result()
+                future.add_done_callback(store)
+        futures[file_info["filename"]] = future
+    return futures
+
+def prune_sha_cache(sha_cache, valid_files):
+    """Drop cache entries for files no longer in upload/, so the cache doesn't grow with every release."""
+    for stale in set(sha_cache) - {sha_cache_key(fi) for fi in valid_files}:
+        del sha_cache[stale]
+
+def write_cask(cask_path, content):
+    """
+    Write a Cask atomically (temp sibling + os.replace), so an interrupted run never leaves
+    a half-written file. Returns False, leaving the file untouched, if it already matches.
+    """
+    data = content.encode("utf-8")
+    try:
+        if cask_path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    tmp_path = cask_path.with_suffix(".rb.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, cask_path)
+    return True
+
+def process_casks(valid_files, new_repo_version, repo_name, sha_futures=None, existing=None):
+    """
+    Update or Create Casks.
+    existing is the set of cask tokens in Casks/ (existing_cask_tokens()); it is updated as casks are created.
+    """
     updates_log = []
     
+    # Hash all assets concurrently; hashlib releases the GIL so threads scale.
+    # Callers may start hashing earlier and pass the futures in.
+    if sha_futures is None:
+        with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(valid_files) or 1)) as ex:
+            return process_casks(valid_files, new_repo_version, repo_name, start_hashing(valid_files, ex), existing)
+
+    if existing is None:
+        existing = existing_cask_tokens()
+
+    # Signature checks are independent mount + spctl runs; overlap them with each other and
+    # with hashing, and keep only the cask edits below serial
+    verify_pool = ThreadPoolExecutor(max_workers=min(VERIFY_WORKERS, len(valid_files) or 1))
+    verify_futures = {fi["filename"]: verify_pool.submit(is_app_verified, fi["path"]) for fi in valid_files}
+    # Queued checks still run; each cask below just waits on its own result
+    verify_pool.shutdown(wait=False)
+
     for file_info in valid_files:
-        file_sha = calculate_sha256(file_info["path"])
-        cask_token = camel_to_kebab(file_info["name"])
+        file_sha = sha_futures[file_info["filename"]].result()
+        cask_token = file_info["cask_token"]
         cask_path = CASKS_DIR / f"{cask_token}.rb"
+        cask_exists = cask_token in existing
         
         # Check verification status and get real app name
-        is_verified, real_app_name = is_app_verified(file_info["path"])
+        is_verified, real_app_name = verify_futures[file_info["filename"]].result()
         
         # Use real app name if found (remove .app extension for template as it adds it back, 
         # but wait, get_cask_template adds .app. 
@@ -585,33 +1354,31 @@ def process_casks(valid_files, new_repo_version, repo_name):
         if file_info["ext"] == "pkg":
             artifact_type = "pkg"
             # Try to get pkg_id again if creating new cask
-            if not cask_path.exists():
+            if not cask_exists:
                  _, pkg_id = get_pkg_info(file_info["path"])
 
         # Construct the future URL for the file in GitHub Releases
         # https://github.com/<user>/<repo>/releases/download/v<RepoVersion>/<filename>
         download_url = f"https://github.com/{repo_name}/releases/download/v{new_repo_version}/{file_info['filename']}"
         
-        if cask_path.exists():
+        if cask_exists:
             # Update existing Cask
             print(f"Updating Cask: {cask_token}.rb")
-            with open(cask_path, "r") as f:
-                content = f.read()
+            # Bytes in, bytes out: line endings are kept exactly as they are on disk
+            original = cask_path.read_bytes().decode("utf-8")
+            content = original
             
-            # Simple regex replacements
-            # Replace version "..." -> version "<new>"
-            content = re.sub(r'version\s+"[^"]+"', f'version "{file_info["version"]}"', content)
-            # Replace sha256 "..." -> sha256 "<new>"
-            content = re.sub(r'sha256\s+"[^"]+"', f'sha256 "{file_sha}"', content)
-            # Replace url "..." -> url "<new>"
-            content = re.sub(r'url\s+"[^"]+"', f'url "{download_url}"', content)
-            
-            # Update app name if real name differs?
-            # Existing cask has 'app "OldName.app"'.
-            # We should probably update it if we know the real name now.
+            # Replace version/sha256/url "..." with the new values in one pass
+            repl = {
+                "version": f'version "{file_info["version"]}"',
+                "sha256": f'sha256 "{file_sha}"',
+                "url": f'url "{download_url}"',
+            }
+            # Existing cask has 'app "OldName.app"'; update it in the same pass if we know the real name
             if artifact_type == "app" and real_app_name:
-                 # Replace app "..." with app "RealName.app"
-                 content = re.sub(r'app\s+"[^"]+"', f'app "{real_app_name}"', content)
+                repl["app"] = f'app "{real_app_name}"'
+            content = _CASK_FIELDS.sub(
+                lambda m: m.group(1) + repl[m.group(2)] if m.group(2) in repl else m.group(0), content)
 
             # Check for postflight for apps and inject if missing AND not verified
             if artifact_type == "app":
@@ -628,13 +1395,21 @@ def process_casks(valid_files, new_repo_version, repo_name):
                      if "# Zap stanza" in content:
                         content = content.replace("# Zap stanza", f"{postflight_stanza}\n  # Zap stanza")
                      else:
-                        content = re.sub(r'(\n\s*end)', f"{postflight_stanza}\\1", content)
+                        # Before the cask's closing `end` only, not every nested block's
+                        last_end = None
+                        for last_end in _CASK_END_RE.finditer(content):
+                            pass
+                        if last_end:
+                            content = content[:last_end.start()] + postflight_stanza + content[last_end.start():]
                  elif is_verified and "postflight do" in content:
                      # Optional: Remove postflight if now verified?
                      pass
 
-            with open(cask_path, "w") as f:
-                f.write(content)
+            # Skip the write (and the mtime bump) when nothing changed
+            if content != original:
+                write_cask(cask_path, content)
+            else:
+                print(f"  {cask_token}.rb already up to date.")
                 
             updates_log.append(f"**{file_info['name']}**: Updated to v{file_info['version']}")
             
@@ -654,8 +1429,8 @@ def process_casks(valid_files, new_repo_version, repo_name):
                 verified=is_verified
             )
             
-            with open(cask_path, "w") as f:
-                f.write(content)
+            write_cask(cask_path, content)
+            existing.add(cask_token)
                 
             updates_log.append(f"**{file_info['name']}**: Initial Release (v{file_info['version']})")
             
@@ -698,22 +1473,45 @@ brew install --cask hereisderek/macapps/<app-command>
 |-------------|---------|-----------------|-------------|
 """
     
+    # Parsed name/version/desc per cask, reused while the file's size and mtime are unchanged
+    try:
+        cache = json.loads(APPS_MD_CACHE.read_bytes())
+    except (OSError, ValueError):
+        cache = {}
+    new_cache = {}
+
+    try:
+        with os.scandir(CASKS_DIR) as it:
+            entries = sorted((e for e in it if e.name.endswith(".rb") and not e.name.startswith(".")),
+                             key=lambda e: e.name)
+    except FileNotFoundError:
+        entries = []
+
     rows = []
-    for cask_file in sorted(CASKS_DIR.glob("*.rb")):
-        if cask_file.name.startswith("."): continue
-        
-        with open(cask_file, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
-            
-        # Parse minimal info using regex
-        name_match = re.search(r'name "([^"]+)"', content)
-        version_match = re.search(r'version "([^"]+)"', content)
-        desc_match = re.search(r'desc "([^"]+)"', content)
-        
-        name = name_match.group(1) if name_match else cask_file.stem
-        version = version_match.group(1) if version_match else "?"
-        desc = desc_match.group(1) if desc_match else ""
-        command = cask_file.stem
+    for entry in entries:
+        st = entry.stat()
+        meta = cache.get(entry.name)
+        if not meta or meta.get("mtime_ns") != st.st_mtime_ns or meta.get("size") != st.st_size:
+            with open(entry.path, "r", encoding="utf-8", errors="ignore") as f:
+                content = f.read()
+                
+            # Parse minimal info using regex
+            name_match = _CASK_NAME_RE.search(content)
+            version_match = _CASK_VERSION_RE.search(content)
+            desc_match = _CASK_DESC_RE.search(content)
+            meta = {
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "name": name_match.group(1) if name_match else None,
+                "version": version_match.group(1) if version_match else None,
+                "desc": desc_match.group(1) if desc_match else None,
+            }
+        new_cache[entry.name] = meta
+
+        command = entry.name[:-3]
+        name = meta["name"] or command
+        version = meta["version"] or "?"
+        desc = meta["desc"] or ""
         
         row = f"| **{name}** | {version} | `brew install --cask hereisderek/macapps/{command}` | {desc} |"
         rows.append(row)
@@ -721,6 +1519,9 @@ brew install --cask hereisderek/macapps/<app-command>
     with open(apps_md_path, "w") as f:
         f.write(header + "\n".join(rows) + "\n")
 
+    if new_cache != cache:
+        APPS_MD_CACHE.write_text(json.dumps(new_cache), encoding="utf-8")
+
 # --- Phase D: Git & GitHub Release ---
 
 def git_commit_push(files_to_commit, message):
@@ -728,34 +1529,64 @@ def git_commit_push(files_to_commit, message):
         # git add
         subprocess.run(["git", "add"] + files_to_commit, check=True)
         
-        # Check if there are changes to commit
-        status = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True)
-        if not status.stdout.strip():
+        # Check if there are staged changes to commit (exit code 1 means there are)
+        staged = run_silent(["git", "diff", "--cached", "--quiet"], check=False)
+        if staged.returncode == 0:
             print("No changes to commit. Skipping git commit.")
         else:
             # git commit
             subprocess.run(["git", "commit", "-m", message], check=True)
             
-        # Get current branch name
-        branch = subprocess.check_output(["git", "rev-parse", "--abbrev-ref", "HEAD"]).decode().strip()
-        
-        # git push
-        print(f"Pushing to {branch}...")
-        subprocess.run(["git", "push", "origin", branch], check=True)
+        # git push; "HEAD" resolves to the current branch, saving a rev-parse spawn
+        print("Pushing current branch to origin...")
+        subprocess.run(["git", "push", "origin", "HEAD"], check=True)
     except subprocess.CalledProcessError as e:
         print(f"Git operation failed: {e}")
         sys.exit(1)
 
-def create_github_release_and_upload(token, repo_name, tag, title, body, assets):
-    g = Github(auth=Auth.Token(token))
+def remove_release_asset(release, name):
+    """Delete a (possibly half-uploaded) asset so the name can be uploaded again."""
+    try:
+        for asset in release.get_assets():
+            if asset.name == name:
+                asset.delete_asset()
+    except Exception as e:
+        print(f"  Warning: Could not clean up asset {name}: {e}")
+
+def create_github_release_and_upload(token, repo_name, tag, title, body, assets, max_workers=UPLOAD_WORKERS):
+    # lazy=True skips the GET for repo metadata we never use
+    g = Github(auth=Auth.Token(token), lazy=True)
     repo = g.get_repo(repo_name)
     
     print(f"Creating GitHub Release {tag}...")
     release = repo.create_git_release(tag=tag, name=title, message=body, draft=False, prerelease=False)
     
-    for asset_path in assets:
-        print(f"Uploading {asset_path.name}...")
-        release.upload_asset(str(asset_path))
+    def upload(asset_path):
+        # PyGithub streams the file from disk, so no extra buffering is needed here
+        for attempt in range(UPLOAD_ATTEMPTS):
+            print(f"Uploading {asset_path.name}...")
+            try:
+                release.upload_asset(str(asset_path))
+                return None
+            except Exception as e:
+                if attempt == UPLOAD_ATTEMPTS - 1:
+                    print(f"  Failed to upload {asset_path.name}: {e}")
+                    return e
+                delay = 2 ** attempt
+                print(f"  Upload of {asset_path.name} failed ({e}), retrying in {delay}s...")
+                time.sleep(delay)
+                remove_release_asset(release, asset_path.name)
+
+    if not assets:
+        return
+
+    # Uploads are network bound; a small pool overlaps the round-trips
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(assets)))) as ex:
+        errors = [e for e in ex.map(upload, assets) if e is not None]
+
+    # Surface partial failures only after every upload has finished
+    if errors:
+        raise errors[0]
 
 # --- Phase E: Cleanup ---
 
@@ -767,208 +1598,410 @@ def cleanup_files(valid_files):
         src = file_info["path"]
         dst = UPLOADED_DIR / src.name
         print(f"Moving {src.name} to uploaded/")
-        shutil.move(src, dst)
+        try:
+            # Single rename(2) on the same filesystem
+            os.replace(src, dst)
+        except OSError:
+            # Cross-device: fall back to copy + unlink
+            shutil.move(str(src), str(dst))
 
 # --- Phase F: Virtual Casks (apps.yaml) ---
 
-def calculate_url_sha256(url):
-    """Calculate SHA256 of a remote file."""
+def load_url_sha_cache():
+    """{url: {"etag", "last_modified", "sha256"}} from earlier runs."""
     try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-        sha256_hash = hashlib.sha256()
-        for chunk in response.iter_content(chunk_size=8192):
-            sha256_hash.update(chunk)
-        return sha256_hash.hexdigest()
+        return json.loads(URL_SHA_CACHE.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+def save_url_sha_cache(cache):
+    URL_SHA_CACHE.write_text(json.dumps(cache, indent=1), encoding="utf-8")
+
+def _url_validators(headers):
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+def _validators_match(cached, current):
+    if cached.get("etag") and current["etag"]:
+        return cached["etag"] == current["etag"]
+    return bool(cached.get("last_modified")) and cached["last_modified"] == current["last_modified"]
+
+def calculate_url_sha256(url, cache=None, session=SESSION, log=print):
+    """
+    Calculate SHA256 of a remote file.
+    With cache (load_url_sha_cache()), a HEAD request whose ETag/Last-Modified matches the
+    cached entry returns the stored hash without downloading; fresh hashes are stored in it.
+    """
+    if cache is not None and url in cache:
+        try:
+            head = session.head(url, allow_redirects=True, timeout=10)
+            if head.ok and _validators_match(cache[url], _url_validators(head.headers)):
+                log(f"    Unchanged since last run (cached SHA256): {url}")
+                return cache[url]["sha256"]
+        except requests.RequestException:
+            pass
+
+    try:
+        with session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            if hasattr(hashlib, "file_digest"):
+                # file_digest (3.11+) reads the socket in C; decode_content undoes any
+                # Content-Encoding the way iter_content would
+                response.raw.decode_content = True
+                digest = hashlib.file_digest(response.raw, "sha256").hexdigest()
+            else:
+                sha256_hash = hashlib.sha256()
+                # Same 1 MiB granularity as local hashing: fewer Python round-trips per MB
+                for chunk in response.iter_content(chunk_size=HASH_CHUNK_SIZE):
+                    sha256_hash.update(chunk)
+                digest = sha256_hash.hexdigest()
     except Exception as e:
-        print(f"    Error downloading {url}: {e}")
+        log(f"    Error downloading {url}: {e}")
         return None
 
-def find_hash_in_release(release, binary_name):
-    """Try to find SHA256 hash in release assets or body."""
-    # 1. Look in assets for checksum files
-    for asset in release.get_assets():
-        name = asset.name.lower()
-        if any(x in name for x in ["checksum", "sha256", "shasum"]):
-            if name.endswith((".txt", ".sha256", ".sha256sum", ".sum")):
-                print(f"    Possible hash file found: {asset.name}. Checking...")
-                try:
-                    resp = requests.get(asset.browser_download_url, timeout=10)
-                    resp.raise_for_status()
-                    content = resp.text
-                    # Look for binary_name in content
-                    # Format is usually: <hash>  <filename>
-                    for line in content.splitlines():
-                        if binary_name in line:
-                            match = re.search(r'([a-fA-F0-9]{64})', line)
-                            if match:
-                                found_hash = match.group(1).lower()
-                                print(f"    Found hash for {binary_name} in {asset.name}: {found_hash}")
-                                return found_hash
-                except Exception as e:
-                    print(f"    Failed to read hash file {asset.name}: {e}")
+    if cache is not None:
+        validators = _url_validators(response.headers)
+        if validators["etag"] or validators["last_modified"]:
+            cache[url] = {**validators, "sha256": digest}
+    return digest
+
+@lru_cache(maxsize=64)
+def _body_hashes(body):
+    """Start offsets and values of every 64-hex hash in a release body, parsed once per body."""
+    matches = list(HEX64_RE.finditer(body))
+    return [m.start() for m in matches], [m.group(0) for m in matches]
+
+def _hash_from_checksum_file(asset, binary_name, session=SESSION, log=print):
+    """Read one checksum asset and return the digest on binary_name's line, if any."""
+    log(f"    Possible hash file found: {asset.name}. Checking...")
+    try:
+        # Stream line by line and stop at the match; the with block closes the
+        # response, so an early return doesn't download the rest of the file
+        with session.get(asset.browser_download_url, timeout=10, stream=True) as resp:
+            resp.raise_for_status()
+            # Look for binary_name in content
+            # Format is usually: <hash>  <filename>
+            for raw_line in resp.iter_lines():
+                line = raw_line.decode("utf-8", "replace")
+                if binary_name in line:
+                    match = HEX64_RE.search(line)
+                    if match:
+                        found_hash = match.group(0).lower()
+                        log(f"    Found hash for {binary_name} in {asset.name}: {found_hash}")
+                        return found_hash
+    except Exception as e:
+        log(f"    Failed to read hash file {asset.name}: {e}")
+    return None
+
+def find_hash_in_release(assets, body, binary_name, session=SESSION, log=print):
+    """Try to find SHA256 hash in a release's assets (already listed) or body."""
+    # 1. Look in assets for checksum files; several (e.g. per-arch SHA256SUMS) are
+    # fetched concurrently, but results are taken in asset order so the pick is deterministic
+    candidates = [asset for asset in assets if CHECKSUM_ASSET_RE.search(asset.name)]
+    if len(candidates) == 1:
+        found_hash = _hash_from_checksum_file(candidates[0], binary_name, session, log)
+        if found_hash:
+            return found_hash
+    elif candidates:
+        pool = ThreadPoolExecutor(max_workers=min(CHECKSUM_PROBE_WORKERS, len(candidates)))
+        try:
+            futures = [pool.submit(_hash_from_checksum_file, asset, binary_name, session, log)
+                       for asset in candidates]
+            for future in futures:
+                found_hash = future.result()
+                if found_hash:
+                    return found_hash
+        finally:
+            # Don't wait for later files' downloads once a hash is found
+            pool.shutdown(wait=False, cancel_futures=True)
 
     # 2. Look in release body for the hash
-    if release.body:
-        print(f"    Checking release body for {binary_name} hash...")
+    if body:
+        log(f"    Checking release body for {binary_name} hash...")
         # Look for a 64-char hex string near the binary name or just any 64-char hex string 
         # specifically associated with the binary.
         # This is a bit risky but we can try to find the binary name and then the next hash.
-        body = release.body
-        if binary_name in body:
-            # Find the index of binary_name
-            idx = body.find(binary_name)
-            # Look for hex string in the next 200 characters
-            snippet = body[idx:idx+300]
-            match = re.search(r'([a-fA-F0-9]{64})', snippet)
-            if match:
-                found_hash = match.group(1).lower()
-                print(f"    Found hash for {binary_name} in release body: {found_hash}")
+        starts, matches = _body_hashes(body)
+        idx = body.find(binary_name)
+        if idx != -1:
+            # First hash that fits in the 300 characters from the binary name
+            i = bisect.bisect_left(starts, idx)
+            if i < len(starts) and starts[i] + 64 <= idx + 300:
+                found_hash = matches[i].lower()
+                log(f"    Found hash for {binary_name} in release body: {found_hash}")
                 return found_hash
         else:
             # If binary name not directly in body, maybe just look for any hash if there's only one?
-            matches = re.findall(r'([a-fA-F0-9]{64})', body)
             if len(matches) == 1:
-                print(f"    Found single hash in release body: {matches[0]}")
+                log(f"    Found single hash in release body: {matches[0]}")
                 return matches[0].lower()
 
     return None
 
-def update_virtual_casks(github_token, calculate_hash=False):
-    """Generate Casks for apps defined in apps.yaml and auto-detect latest version."""
-    if not APPS_YAML.exists():
-        print(f"Error: {APPS_YAML} not found.")
-        return []
+def _release_matches(release, clean_v):
+    return clean_v in release.tag_name or (release.name and clean_v in release.name)
 
-    with open(APPS_YAML, "r") as f:
-        apps_config = yaml.safe_load(f)
+def _scan_releases(repo, clean_v, index):
+    """
+    Substring fallback over the release list, newest first. Fetched releases are indexed
+    by bare tag and by name, so exact hits are a dict lookup; further pages are fetched
+    only on a miss, resuming where the previous scan stopped.
+    """
+    exact = index.setdefault("exact", {})
+    fetched = index.setdefault("fetched", [])
+    if clean_v in exact:
+        return exact[clean_v]
+    release = next((r for r in fetched if _release_matches(r, clean_v)), None)
+    if release:
+        return release
+
+    if "pages" not in index:
+        index["pages"] = iter(repo.get_releases())
+    for r in index["pages"]:
+        fetched.append(r)
+        # setdefault keeps the newest release for a duplicated tag/name
+        exact.setdefault(r.tag_name.lstrip('v'), r)
+        if r.name:
+            exact.setdefault(r.name, r)
+        if _release_matches(r, clean_v):
+            return r
+    return None
 
-    if not apps_config:
-        print("No apps found in apps.yaml")
-        return []
+def find_release(repo, clean_v, cache, index):
+    """
+    Resolve the release for a version. Tries the tag directly (v1.2 / 1.2) and only
+    falls back to scanning release pages (see _scan_releases) when neither tag exists.
+    Results, including misses, are memoized in `cache`; `index` holds the scan state.
+    """
+    if clean_v in cache:
+        return cache[clean_v]
 
-    g = Github(auth=Auth.Token(github_token))
-    updated_apps_info = []
-    yaml_changed = False
+    release = None
+    for tag in (f"v{clean_v}", clean_v):
+        try:
+            release = repo.get_release(tag)
+            break
+        except UnknownObjectException:
+            pass
+    if release is None:
+        release = _scan_releases(repo, clean_v, index)
+    cache[clean_v] = release
+    return release
 
-    for app_name, config in apps_config.items():
-        github_url = config.get("github")
-        versions = config.get("versions", [])
-        xattr_clear = config.get("xattr_clear", False)
-        
-        if not github_url:
-            print(f"Missing github url for {app_name}")
+def probe_app(app_name, config, g, calculate_hash, url_sha_cache, session=SESSION):
+    """
+    Check one apps.yaml entry for new releases and render the Casks it needs.
+    Only reads from the network and disk; returns (versions, new_version, casks, lines)
+    where new_version is the newly detected latest version (None if unchanged), casks is a
+    list of (cask_path, content, info) for the caller to write, and lines are the probe's
+    progress messages, returned rather than printed so concurrent probes don't interleave.
+    """
+    github_url = config.get("github")
+    versions = config.get("versions", [])
+    xattr_clear = config.get("xattr_clear", False)
+    casks = []
+    # Probes run in parallel; collect this app's messages so the caller prints them together
+    lines = []
+    log = lines.append
+
+    if not github_url:
+        log(f"Missing github url for {app_name}")
+        return versions, None, casks, lines
+
+    # Token is per app; only the @version suffix varies per version
+    base_token = camel_to_kebab(app_name)
+
+    # Extract repo path (owner/repo) from URL
+    repo_path = github_url.replace("https://github.com/", "").strip("/")
+    log(f"Checking for updates: {app_name} ({repo_path})")
+
+    try:
+        external_repo = g.get_repo(repo_path)
+        latest_release = external_repo.get_latest_release()
+        # The client is lazy: reading tag_name is what sends the request, so a missing
+        # repo/release or a network error has to surface here
+        latest_tag = latest_release.tag_name
+    except Exception as e:
+        log(f"Error fetching repo/releases for {repo_path}: {e}")
+        return versions, None, casks, lines
+
+    # Check if the latest release is already in our list
+    latest_v = latest_tag.lstrip('v')
+    release_cache = {latest_v: latest_release}
+    release_index = {}
+    current_v = ""
+    if versions:
+        first_v = versions[0]
+        if isinstance(first_v, dict):
+            current_v = str(first_v.get("version", "")).lstrip('v')
+        else:
+            current_v = str(first_v).lstrip('v')
+
+    new_version = None
+    if latest_v != current_v:
+        log(f"  New version detected for {app_name}: {current_v} -> {latest_v}")
+        # Add to the beginning of the list as string
+        new_version = str(latest_v)
+        versions = [new_version] + versions
+
+    # Now process all versions in the YAML to ensure Casks are up to date
+    for i, version_info in enumerate(versions):
+        if isinstance(version_info, dict):
+            version_str = str(version_info.get("version"))
+            v_xattr_clear = version_info.get("xattr_clear", xattr_clear)
+        else:
+            version_str = str(version_info)
+            v_xattr_clear = xattr_clear
+
+        if not version_str or version_str == "None": continue
+        clean_v = version_str.lstrip('v')
+
+        # Check if Cask already exists and matches version; decided before any API call,
+        # so Casks that are already up to date cost no release/asset lookups
+        is_latest = (i == 0)
+        token = base_token if is_latest else f"{base_token}@{clean_v}"
+        cask_path = CASKS_DIR / f"{token}.rb"
+
+        is_new_app = not cask_path.exists()
+
+        # Even if it exists, we might want to update it if it's the latest and has changed?
+        # For now, if it's the latest and we just detected a bump, we definitely update.
+        if not (is_new_app or (is_latest and latest_v == clean_v and new_version)):
             continue
 
-        # Extract repo path (owner/repo) from URL
-        repo_path = github_url.replace("https://github.com/", "").strip("/")
-        print(f"Checking for updates: {app_name} ({repo_path})")
-        
+        # Find matching release
         try:
-            external_repo = g.get_repo(repo_path)
-            latest_release = external_repo.get_latest_release()
-            all_releases = list(external_repo.get_releases())
+            release = find_release(external_repo, clean_v, release_cache, release_index)
         except Exception as e:
-            print(f"Error fetching repo/releases for {repo_path}: {e}")
+            log(f"  Error looking up release {clean_v} for {repo_path}: {e}")
             continue
 
-        # Check if the latest release is already in our list
-        latest_v = latest_release.tag_name.lstrip('v')
-        current_v = ""
-        if versions:
-            first_v = versions[0]
-            if isinstance(first_v, dict):
-                current_v = str(first_v.get("version", "")).lstrip('v')
-            else:
-                current_v = str(first_v).lstrip('v')
-
-        if latest_v != current_v:
-            print(f"  New version detected for {app_name}: {current_v} -> {latest_v}")
-            # Add to the beginning of the list as string
-            versions.insert(0, str(latest_v))
-            apps_config[app_name]["versions"] = versions
-            yaml_changed = True
-        
-        # Now process all versions in the YAML to ensure Casks are up to date
-        for i, version_info in enumerate(versions):
-            if isinstance(version_info, dict):
-                version_str = str(version_info.get("version"))
-                v_xattr_clear = version_info.get("xattr_clear", xattr_clear)
-            else:
-                version_str = str(version_info)
-                v_xattr_clear = xattr_clear
+        if not release: continue
 
-            if not version_str or version_str == "None": continue
-            clean_v = version_str.lstrip('v')
-            
-            # Find matching release
-            release = None
-            for r in all_releases:
-                if clean_v in r.tag_name or (r.name and clean_v in r.name):
-                    release = r
-                    break
-            
-            if not release: continue
-
-            # Find best asset
-            asset = None
-            for a in release.get_assets():
-                if a.name.lower().endswith((".dmg", ".pkg", ".zip")):
-                    asset = a
-                    break
-            
-            if not asset: continue
+        # List assets once; the checksum lookup below reuses the list
+        assets = list(release.get_assets())
 
-            # Check if Cask already exists and matches version
-            base_token = camel_to_kebab(app_name)
-            is_latest = (i == 0)
-            token = base_token if is_latest else f"{base_token}@{clean_v}"
-            cask_path = CASKS_DIR / f"{token}.rb"
+        # Find best asset
+        asset = None
+        for a in assets:
+            if ASSET_EXT_RE.search(a.name):
+                asset = a
+                break
 
-            is_new_app = not cask_path.exists()
-            
-            # Even if it exists, we might want to update it if it's the latest and has changed? 
-            # For now, if it's the latest and we just detected a bump, we definitely update.
-            if is_new_app or (is_latest and latest_v == clean_v and yaml_changed):
-                print(f"  Processing Cask for {app_name} v{clean_v}...")
-                
-                # SHA256 Strategy
-                file_sha = None
-                if calculate_hash:
-                    file_sha = calculate_url_sha256(asset.browser_download_url)
-                else:
-                    file_sha = find_hash_in_release(release, asset.name)
-                    if not file_sha:
-                        file_sha = calculate_url_sha256(asset.browser_download_url)
-                
-                if not file_sha: continue
+        if not asset: continue
 
-                artifact_type = "pkg" if asset.name.endswith(".pkg") else "app"
-                
-                content = get_cask_template(
-                    token=token,
-                    name=app_name,
-                    version=clean_v,
-                    sha256=file_sha,
-                    url=asset.browser_download_url,
-                    homepage_url=github_url,
-                    artifact_type=artifact_type,
-                    verified=not v_xattr_clear 
-                )
-                
-                with open(cask_path, "w") as f:
-                    f.write(content)
+        log(f"  Processing Cask for {app_name} v{clean_v}...")
+
+        # SHA256 Strategy
+        file_sha = None
+        if calculate_hash:
+            file_sha = calculate_url_sha256(asset.browser_download_url, url_sha_cache, session, log)
+        else:
+            file_sha = release_hash(release, assets, asset.name, session, log)
+            if not file_sha:
+                file_sha = calculate_url_sha256(asset.browser_download_url, url_sha_cache, session, log)
+
+        if not file_sha: continue
+
+        artifact_type = "pkg" if asset.name.endswith(".pkg") else "app"
+
+        content = get_cask_template(
+            token=token,
+            name=app_name,
+            version=clean_v,
+            sha256=file_sha,
+            url=asset.browser_download_url,
+            homepage_url=github_url,
+            artifact_type=artifact_type,
+            verified=not v_xattr_clear
+        )
+        casks.append((cask_path, content, {
+            "name": app_name,
+            "version": clean_v,
+            "is_new": is_new_app
+        }))
+
+    return versions, new_version, casks, lines
+
+def release_hash(release, assets, binary_name, session=SESSION, log=print):
+    """find_hash_in_release, memoized per (release, asset) for the life of the process."""
+    key = (release.id, binary_name)
+    if key not in _RELEASE_HASH_CACHE:
+        _RELEASE_HASH_CACHE[key] = find_hash_in_release(assets, release.body, binary_name, session, log)
+    return _RELEASE_HASH_CACHE[key]
+
+def prepend_yaml_versions(text, bumps):
+    """
+    Insert each app's new version at the top of its `versions:` list by editing the
+    apps.yaml text, so comments and formatting survive. Returns None if an app's list
+    isn't a block sequence this can find; the caller then dumps the whole document.
+    """
+    for app_name, version in bumps.items():
+        app = re.search(rf'^{re.escape(app_name)}:[ \t]*\n', text, re.M)
+        if not app:
+            return None
+        block_end = _YAML_TOP_LEVEL_RE.search(text, app.end())
+        versions = _YAML_VERSIONS_RE.search(text, app.end(), block_end.start() if block_end else len(text))
+        if not versions:
+            return None
+        # Let the dumper decide quoting (e.g. "1.10" must stay a string)
+        scalar = yaml.dump(version, Dumper=YamlDumper).splitlines()[0]
+        pos = versions.start(1)
+        text = f"{text[:pos]}{versions.group(1)}- {scalar}\n{text[pos:]}"
+    return text
+
+def update_virtual_casks(github_token, calculate_hash=False, session=SESSION):
+    """Generate Casks for apps defined in apps.yaml and auto-detect latest version.
+    All checksum probes and asset downloads share `session`'s connection pool."""
+    if not APPS_YAML.exists():
+        print(f"Error: {APPS_YAML} not found.")
+        return []
+
+    yaml_text = APPS_YAML.read_text(encoding="utf-8")
+    apps_config = yaml.load(yaml_text, Loader=YamlLoader)
+
+    if not apps_config:
+        print("No apps found in apps.yaml")
+        return []
+
+    # lazy=True: get_repo() doesn't GET repo metadata (only its releases are used);
+    # per_page=100: release and asset listings take a third of the round-trips
+    g = Github(auth=Auth.Token(github_token), lazy=True, per_page=100)
+    updated_apps_info = []
+    version_bumps = {}
+    url_sha_cache = load_url_sha_cache()
+    url_cache_before = dict(url_sha_cache)
+
+    # Probe apps concurrently (network-bound); apply YAML edits and Cask writes here, in
+    # apps.yaml order, so output is deterministic
+    with ThreadPoolExecutor(max_workers=APP_PROBE_WORKERS) as pool:
+        futures = {
+            app_name: pool.submit(probe_app, app_name, config, g, calculate_hash, url_sha_cache, session)
+            for app_name, config in apps_config.items()
+        }
+        for app_name, future in futures.items():
+            versions, new_version, casks, lines = future.result()
+            print("\n".join(lines))
+            if new_version:
+                apps_config[app_name]["versions"] = versions
+                version_bumps[app_name] = new_version
+
+            for cask_path, content, info in casks:
+                if not write_cask(cask_path, content):
+                    print(f"  {cask_path.name} already up to date.")
+                    continue
                 print(f"  Created/Updated Cask: {cask_path.name}")
-                
-                updated_apps_info.append({
-                    "name": app_name,
-                    "version": clean_v,
-                    "is_new": is_new_app
-                })
-
-    if yaml_changed:
-        with open(APPS_YAML, "w") as f:
-            yaml.dump(apps_config, f, sort_keys=False)
+                updated_apps_info.append(info)
+
+    if url_sha_cache != url_cache_before:
+        save_url_sha_cache(url_sha_cache)
+
+    if version_bumps:
+        # Only new list items change; fall back to a full dump if the in-place edit can't
+        # be applied or doesn't reproduce the updated config exactly
+        new_text = prepend_yaml_versions(yaml_text, version_bumps)
+        if new_text is None or yaml.load(new_text, Loader=YamlLoader) != apps_config:
+            new_text = yaml.dump(apps_config, sort_keys=False, Dumper=YamlDumper)
+        APPS_YAML.write_text(new_text, encoding="utf-8")
         print(f"Updated {APPS_YAML.name}")
 
     return updated_apps_info
@@ -981,6 +2014,8 @@ def main():
     parser.add_argument("--non-interactive", action="store_true", help="Skip manual inspection pause")
     parser.add_argument("--update", action="store_true", help="Generate virtual casks from apps.yaml for GitHub apps")
     parser.add_argument("--hash", action="store_true", help="Force local calculation of SHA256 by downloading the file")
+    parser.add_argument("--upload-concurrency", type=int, default=UPLOAD_WORKERS, metavar="N",
+                        help=f"Release assets uploaded in parallel (default: {UPLOAD_WORKERS})")
     args = parser.parse_args()
 
     # Phase A
@@ -991,11 +2026,23 @@ def main():
         print("Running in --update mode. Checking apps.yaml for new releases...")
         updated_apps_info = update_virtual_casks(github_token, calculate_hash=args.hash)
 
-    # Pre-process: Repack any non-compliant archives
-    preprocess_files()
+    state = load_state()
+    sha_cache = load_sha_cache()
+    hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+    sha_futures = {}
+
+    def hash_early(path):
+        file_info = upload_file_info(path)
+        if file_info:
+            sha_futures.update(start_hashing([file_info], hash_pool, sha_cache))
+
+    # Pre-process: Repack any non-compliant archives.
+    # Without the inspection pause nobody touches upload/ afterwards, so each file is
+    # hashed as soon as it is final, overlapping the remaining repacks.
+    upload_files = preprocess_files(on_ready=hash_early if args.non_interactive else None)
     
     # Pause for manual inspection
-    valid_files = scan_upload_folder()
+    valid_files = scan_upload_folder(upload_files)
     
     if valid_files and not args.non_interactive:
         print("\nRepacking phase complete.")
@@ -1009,10 +2056,15 @@ def main():
         print("No local uploads or virtual updates found. Nothing to do.")
         sys.exit(0)
 
+    # Hash whatever wasn't started early, in the background so it overlaps versioning and signature checks
+    pending = [fi for fi in valid_files if fi["filename"] not in sha_futures]
+    sha_futures.update(start_hashing(pending, hash_pool, sha_cache))
+    prune_sha_cache(sha_cache, valid_files)
+
     # Phase B
-    state = load_state()
     current_repo_version = state.get("version", "0.0.0")
-    new_repo_version = determine_version_bump(valid_files, updated_apps_info, current_repo_version, args.major)
+    cask_tokens = existing_cask_tokens()
+    new_repo_version = determine_version_bump(valid_files, updated_apps_info, current_repo_version, args.major, cask_tokens)
     
     if str(new_repo_version) == current_repo_version and not args.major:
         print("No changes detected. Skipping release.")
@@ -1024,7 +2076,10 @@ def main():
     # Phase C
     updates_log = []
     if valid_files:
-        updates_log.extend(process_casks(valid_files, new_repo_version, repo_name))
+        updates_log.extend(process_casks(valid_files, new_repo_version, repo_name, sha_futures, cask_tokens))
+    # Joins the workers, so sha_cache callbacks have run before it is saved
+    hash_pool.shutdown()
+    save_sha_cache(sha_cache)
     
     for app in updated_apps_info:
         status = "Initial Release" if app["is_new"] else "Updated"
@@ -1054,8 +2109,11 @@ def main():
         release_title = f"Release {release_tag}"
         release_notes = "## Updates\n" + "\n".join([f"* {log}" for log in updates_log])
         
-        asset_paths = [f["path"] for f in valid_files]
-        create_github_release_and_upload(github_token, repo_name, release_tag, release_title, release_notes, asset_paths)
+        # Largest first, so a big DMG isn't the lone upload still running at the end
+        ordered = sorted(valid_files, key=lambda f: upload_stat(f).st_size, reverse=True)
+        asset_paths = [f["path"] for f in ordered]
+        create_github_release_and_upload(github_token, repo_name, release_tag, release_title, release_notes,
+                                         asset_paths, args.upload_concurrency)
     else:
         # If ONLY virtual apps updated, we don't need to upload assets to a release, 
         # but we should still create a tag/release for the repo version.